@@ -7,13 +7,20 @@ Example script for syncing NOAA weather data
 
 from __future__ import annotations
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from meerschaum.utils.typing import Dict, List, Any, Optional, Iterator
 import meerschaum as mrsm
 from ._register import register
-from ._stations import get_stations, get_station_info, fetch_station_data
+from ._stations import (
+    get_stations,
+    get_station_info,
+    fetch_station_data,
+    save_stations_info_cache,
+    MAX_WORKERS,
+)
 
-__version__ = '1.4.1'
-required = ['requests', 'pytz',]
+__version__ = '1.5.0'
+required = ['requests', 'orjson',]
 
 def fetch(
         pipe: mrsm.Pipe,
@@ -27,8 +34,14 @@ def fetch(
     stations = get_stations(pipe)
     backtrack_interval = pipe.get_backtrack_interval()
     
+    ### A pipe without a sync time has none for any station, so skip the per-station queries.
+    check_stations = begin is None and pipe.get_sync_time() is not None
     station_sync_times = {
-        station: (begin or pipe.get_sync_time(params={'station': station}))
+        station: (
+            pipe.get_sync_time(params={'station': station})
+            if check_stations
+            else begin
+        )
         for station in stations
     }
     station_starts = {
@@ -40,5 +53,35 @@ def fetch(
         for station, sync_time in station_sync_times.items()
     }
 
-    for station, start in station_starts.items():
-        yield fetch_station_data(station, begin=start, end=end)
+    if not station_starts:
+        save_stations_info_cache()
+        return
+
+    ### Stations are independent URLs, so fetch them concurrently over the shared session.
+    ### The pool never outgrows the session's connection pool or the number of stations.
+    workers = pipe.parameters.get('noaa', {}).get('workers', MAX_WORKERS)
+    workers = max(1, min(int(workers), MAX_WORKERS, len(station_starts)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    station_items = iter(station_starts.items())
+
+    def submit_next() -> None:
+        item = next(station_items, None)
+        if item is not None:
+            station, start = item
+            in_flight.add(executor.submit(fetch_station_data, station, begin=start, end=end))
+
+    ### Keep at most `workers` stations in flight so downloads can't run far ahead
+    ### of the consumer, and yield each station as soon as it's parsed.
+    in_flight = set()
+    try:
+        for _ in range(workers):
+            submit_next()
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                submit_next()
+                yield future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        ### Persist the station metadata fetched during this run in a single write.
+        save_stations_info_cache()
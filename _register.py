@@ -9,7 +9,7 @@ Return the parameters when registering with this plugin.
 import meerschaum as mrsm
 from meerschaum.utils.typing import Dict, Any
 
-from ._stations import ask_for_stations, get_station_info
+from ._stations import ask_for_stations, get_station_info, save_stations_info_cache
 
 def register(pipe: mrsm.Pipe) -> Dict[str, Any]:
     """
@@ -20,11 +20,12 @@ def register(pipe: mrsm.Pipe) -> Dict[str, Any]:
         stations_dict = {stationID: {} for stationID in stations_dict}
 
     if stations_dict:
-        for stationID, station_info in {k: v for k, v in stations_dict.items()}.items():
+        for stationID, station_info in list(stations_dict.items()):
             if 'name' not in station_info:
                 stations_dict[stationID] = get_station_info(stationID)
     else:
         stations_dict = ask_for_stations(pipe)
+    save_stations_info_cache()
 
     return {
         'columns': {
@@ -6,31 +6,197 @@
 Station utility functions.
 """
 
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
 import meerschaum as mrsm
 from meerschaum.utils.typing import Dict, List, Any, Optional
+from meerschaum.utils.warnings import warn
 STATIONS_BASE_URL: str = "https://api.weather.gov/stations"
+MAX_WORKERS: int = 8
+### Seconds to wait to connect or between bytes before a request is retried or abandoned.
+REQUEST_TIMEOUT: int = 30
+ERROR_TEXT_LENGTH: int = 512
+STATIONS_CACHE_FILENAME: str = 'noaa_stations.json'
+STATIONS_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60
 
 _stations_info_cache: Dict[str, Any] = {}
+_stations_info_cache_times: Dict[str, float] = {}
+_stations_info_cache_loaded: bool = False
+_stations_info_cache_dirty: bool = False
+_stations_info_cache_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+_json_loads_func = None
+
+def get_session() -> 'requests.Session':
+    """
+    Return the shared `requests.Session` so connections to `api.weather.gov` are reused.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        ### `api.weather.gov` rate-limits and intermittently returns 5xx, so back off and retry.
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 502, 503, 504],
+            raise_on_status=False,
+        )
+        session.mount(
+            'https://',
+            HTTPAdapter(
+                pool_connections=MAX_WORKERS,
+                pool_maxsize=MAX_WORKERS,
+                max_retries=retry,
+            ),
+        )
+        _session = session
+    return _session
+
+
+def _json_loads(content: bytes) -> Any:
+    """
+    Parse a JSON response body with `orjson`, falling back to the standard library.
+    """
+    global _json_loads_func
+    if _json_loads_func is None:
+        try:
+            import orjson
+            _json_loads_func = orjson.loads
+        except ImportError:
+            _json_loads_func = json.loads
+    return _json_loads_func(content)
+
+
+def _get_stations_cache_path() -> 'pathlib.Path':
+    """
+    Return the path to the on-disk station metadata cache.
+    """
+    from meerschaum.config._paths import PLUGINS_TEMP_RESOURCES_PATH
+    return PLUGINS_TEMP_RESOURCES_PATH / STATIONS_CACHE_FILENAME
+
+
+def _read_stations_cache_file() -> Dict[str, Any]:
+    """
+    Read the raw entries (`{stationID: {'cached': ..., 'info': ...}}`) from the disk cache.
+    """
+    try:
+        with open(_get_stations_cache_path(), 'rb') as f:
+            entries = _json_loads(f.read())
+    except Exception as e:
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def _load_stations_info_cache() -> Dict[str, Any]:
+    """
+    Populate the in-memory station metadata cache with the unexpired disk entries (once).
+    """
+    global _stations_info_cache_loaded, _stations_info_cache_dirty
+    with _stations_info_cache_lock:
+        if _stations_info_cache_loaded:
+            return _stations_info_cache
+        now = time.time()
+        entries = _read_stations_cache_file()
+        for stationID, entry in entries.items():
+            try:
+                cached = float(entry['cached'])
+                if now - cached < STATIONS_CACHE_TTL_SECONDS:
+                    _stations_info_cache.setdefault(stationID, entry['info'])
+                    _stations_info_cache_times.setdefault(stationID, cached)
+            except Exception as e:
+                continue
+
+        ### Rewrite the file on the next save if any entries were pruned.
+        if len(_stations_info_cache_times) < len(entries):
+            _stations_info_cache_dirty = True
+        _stations_info_cache_loaded = True
+    return _stations_info_cache
+
+
+def _cache_station_info(stationID: str, station_info: Dict[str, Any]) -> None:
+    """
+    Add a station's metadata to the in-memory cache, to be persisted by `save_stations_info_cache()`.
+    """
+    global _stations_info_cache_dirty
+    with _stations_info_cache_lock:
+        _stations_info_cache[stationID] = station_info
+        _stations_info_cache_times[stationID] = time.time()
+        _stations_info_cache_dirty = True
+
+
+def save_stations_info_cache() -> None:
+    """
+    Write the in-memory station metadata to the disk cache if it changed,
+    atomically replacing the file.
+    """
+    global _stations_info_cache_dirty
+    with _stations_info_cache_lock:
+        if not _stations_info_cache_dirty:
+            return
+        entries = {
+            stationID: {'cached': cached, 'info': _stations_info_cache[stationID]}
+            for stationID, cached in _stations_info_cache_times.items()
+            if stationID in _stations_info_cache
+        }
+        _stations_info_cache_dirty = False
+
+    path = _get_stations_cache_path()
+    temp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, path)
+    except Exception as e:
+        warn(f"Failed to write the stations cache:\n{e}", stack=False)
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _print_line(message: str) -> None:
+    """
+    Print a message and its newline in a single write so output from the fetch threads
+    doesn't interleave.
+    """
+    print(message + '\n', end='', flush=True)
+
+
+def _get_response_error_text(response: 'requests.Response') -> str:
+    """
+    Return the beginning of a failed response's body without decoding all of it.
+    """
+    return response.content[:ERROR_TEXT_LENGTH].decode('utf-8', errors='replace')
+
 
 def get_station_info(stationID: str) -> Dict[str, Any]:
     """
     Fetch the metadata for a station.
     """
-    from meerschaum.utils.warnings import warn
-    import requests
-    station_info = _stations_info_cache.get(stationID, {})
+    station_info = _load_stations_info_cache().get(stationID, {})
     if station_info:
         return station_info
     url = STATIONS_BASE_URL + "/" + stationID
-    response = requests.get(url)
-    if not response:
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    if not response.ok:
         warn(
-            f"Unable to get information for station '{stationID}':\n{response.text}",
+            f"Unable to get information for station '{stationID}' "
+            + f"(HTTP {response.status_code}):\n{_get_response_error_text(response)}",
             stack = False,
         )
         return station_info
 
-    info = response.json()
+    info = _json_loads(response.content)
 
     try:
         geo = info['geometry']
@@ -45,7 +211,7 @@ def get_station_info(stationID: str) -> Dict[str, Any]:
     station_info['name'] = name
     if geo is not None:
         station_info['geometry'] = geo
-    _stations_info_cache[stationID] = station_info
+    _cache_station_info(stationID, station_info)
     return station_info
 
 
@@ -53,8 +219,7 @@ def ask_for_stations(pipe, debug: bool = False) -> Dict[str, Any]:
     """
     Prompt the user for stations and return a dictionary.
     """
-    import requests, json, re
-    from meerschaum.utils.warnings import warn, info
+    from meerschaum.utils.warnings import info
     from meerschaum.utils.prompt import yes_no, prompt
     from meerschaum.utils.formatting import pprint
 
@@ -65,60 +230,61 @@ def ask_for_stations(pipe, debug: bool = False) -> Dict[str, Any]:
     To fetch all stations from a state, enter the state abbreviation
     (e.g. 'GA' for Georgia).
     """
-    info(instructions)
-
-    stations = {}
-
+    ### Keep prompting until the user accepts a set of stations.
     while True:
-        stationID = prompt("Enter station ID or state abbreviation, empty to stop: ", icon=False)
-        if stationID == '':
-            break
-
-        if len(stationID) == 2:
-            state_abbrev = stationID
-            if yes_no(
-                f"Are you sure you want to fetch from all stations in the state '{state_abbrev}'? " +
-                "This will be very slow!"
-            ):
-                stations = get_state_stations(state_abbrev)
+        stations = {}
+        info(instructions)
+
+        while True:
+            stationID = prompt("Enter station ID or state abbreviation, empty to stop: ", icon=False)
+            if stationID == '':
                 break
 
-        url = STATIONS_BASE_URL + "/" + stationID
-        response = requests.get(url)
-        if not response:
-            warn(
-                f"Unable to get information for station '{stationID}':\n{response.text}",
-                stack = False,
-            )
-            continue
+            if len(stationID) == 2:
+                state_abbrev = stationID
+                if yes_no(
+                    f"Are you sure you want to fetch from all stations in the state '{state_abbrev}'? " +
+                    "This will be very slow!"
+                ):
+                    stations = get_state_stations(state_abbrev)
+                    break
+
+            url = STATIONS_BASE_URL + "/" + stationID
+            response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+            if not response.ok:
+                warn(
+                    f"Unable to get information for station '{stationID}' "
+                    + f"(HTTP {response.status_code}):\n{_get_response_error_text(response)}",
+                    stack = False,
+                )
+                continue
 
-        info = response.json()
+            station_json = _json_loads(response.content)
 
-        try:
-            geo = info['geometry']
-        except:
-            geo = None
-        try:
-            name = info['properties']['name'].rstrip()
-        except:
-            warn(f"Unable to fetch name for station '{stationID}'. Skipping...", stack=False)
-            continue
+            try:
+                geo = station_json['geometry']
+            except:
+                geo = None
+            try:
+                name = station_json['properties']['name'].rstrip()
+            except:
+                warn(f"Unable to fetch name for station '{stationID}'. Skipping...", stack=False)
+                continue
 
-        if not yes_no(f"Is '{name}' a good label for station '{stationID}'?"):
-            name = prompt(f"New label for station '{stationID}': ", icon=False)
+            if not yes_no(f"Is '{name}' a good label for station '{stationID}'?"):
+                name = prompt(f"New label for station '{stationID}': ", icon=False)
 
-        stations[stationID] = {}
-        stations[stationID]['name'] = name
-        if geo is not None:
-            stations[stationID]['geometry'] = geo
+            stations[stationID] = {}
+            stations[stationID]['name'] = name
+            if geo is not None:
+                stations[stationID]['geometry'] = geo
 
-    pprint(stations)
-    if not yes_no(f"Would you like to register the above stations to pipe '{pipe}'?"):
-        print("Resetting stations and starting over...")
-        pipe.parameters['noaa']['stations'] = {}
-        return ask_for_stations(pipe, debug=debug)
+        pprint(stations)
+        if yes_no(f"Would you like to register the above stations to pipe '{pipe}'?"):
+            return stations
 
-    return stations
+        print("Resetting stations and starting over...")
+        pipe.parameters.setdefault('noaa', {})['stations'] = {}
 
 
 def get_stations(pipe: 'mrsm.Pipe') -> Dict[str, Any]:
@@ -130,19 +296,16 @@ def get_stations(pipe: 'mrsm.Pipe') -> Dict[str, Any]:
     if isinstance(stations_dict, list):
         stations_dict = {stationID: {} for stationID in stations_dict}
 
-    for stationID, station_info in {k: v for k, v in stations_dict.items()}.items():
+    for stationID, station_info in list(stations_dict.items()):
         if 'name' not in station_info:
             stations_dict[stationID] = get_station_info(stationID)
             edit = True
 
     if edit:
-        pipe.parameters['noaa']['stations'] = stations_dict
+        pipe.parameters.setdefault('noaa', {})['stations'] = stations_dict
         pipe.edit()
 
-    try:
-        return pipe.parameters['noaa']['stations']
-    except Exception as e:
-        return {}
+    return pipe.parameters.get('noaa', {}).get('stations', {})
 
 
 def get_state_stations(
@@ -152,28 +315,25 @@ def get_state_stations(
     """
     Parse every station in a state
     """
-    from meerschaum.utils.warnings import warn
-    import requests, json
     url = "https://api.weather.gov/stations"
     stations = {}
     print(f"Retrieving stations for state '{state_abbrev}'...")
-    d = json.loads(requests.get(url, params={'state' : state_abbrev}).text)
+    response = get_session().get(url, params={'state' : state_abbrev}, timeout=REQUEST_TIMEOUT)
+    d = _json_loads(response.content)
     if 'features' not in d:
         warn(f"No stations retrieved for state '{state_abbrev}'.", stack=False)
         return stations
     for f in d['features']:
         stationID = None
         try:
-            stationID = f['id'].split('/stations/')[-1]
-            geo = f.get('geometry', None)
-            name = f['properties']['name'].lstrip().rstrip()
-        except:
+            stationID = f['id'].rsplit('/stations/', 1)[-1]
+            stations[stationID] = {
+                'name': f['properties']['name'].strip(),
+                'geometry': f.get('geometry', None),
+            }
+        except (KeyError, TypeError, AttributeError):
             if stationID is not None:
                 warn(f"Could not determine name for station '{stationID}'. Skipping...")
-            continue
-        stations[stationID] = dict()
-        stations[stationID]['name'] = name
-        stations[stationID]['geometry'] = geo
     return stations
 
 
@@ -185,25 +345,20 @@ def fetch_station_data(
     """
     Fetch JSON for a given stationID from NOAA and parse into a dataframe
     """
-    from meerschaum.utils.packages import import_pandas
-    from meerschaum.utils.misc import parse_df_datetimes
-    from meerschaum.utils.warnings import warn
-    import json, pytz, datetime, requests
-    pd = import_pandas()
     ### Get the latest sync time for this station so we don't request duplicate data.
     start = (
-        begin.replace(tzinfo=pytz.timezone('UTC')).isoformat()
+        begin.replace(tzinfo=datetime.timezone.utc).isoformat()
         if begin is not None
         else None
     )
     end = (
-        end.replace(tzinfo=pytz.timezone('UTC')).isoformat()
+        end.replace(tzinfo=datetime.timezone.utc).isoformat()
         if end is not None
         else None
     )
     info_dict = get_station_info(stationID)
 
-    print(
+    _print_line(
         (f"{start} - {end}\n" if start else '')
         + f"Fetching data for station '{stationID}' ({info_dict['name']})..."
     )
@@ -211,17 +366,31 @@ def fetch_station_data(
     url = f"https://api.weather.gov/stations/{stationID}/observations/"
     response = None
     try:
-        response = requests.get(url, params={"start":start, "end": end})
-        data = json.loads(response.text)
+        response = get_session().get(
+            url,
+            params={"start": start, "end": end},
+            timeout=REQUEST_TIMEOUT,
+        )
+        if not response.ok:
+            warn(
+                f"Failed to fetch data for station '{stationID}' ({info_dict['name']}) "
+                + f"(HTTP {response.status_code}):\n{_get_response_error_text(response)}",
+                stack = False,
+            )
+            return None
+        data = _json_loads(response.content)
     except Exception as e:
-        print(f"\nFailed to parse JSON with exception: {e}", flush=True)
-        if response is not None:
-            print("Received text:\n" + response.text)
+        _print_line(
+            f"\nFailed to parse JSON with exception: {e}"
+            + (
+                ("\nReceived text:\n" + _get_response_error_text(response))
+                if response is not None
+                else ''
+            )
+        )
         return None
-    print(f"Done fetching data for station '{stationID}' ({info_dict['name']}).", flush=True)
+    _print_line(f"Done fetching data for station '{stationID}' ({info_dict['name']}).")
 
-    ### build a dictionary from the JSON response.
-    d = {'location': [], 'geometry': [], 'cloudLayers': [] }
     if 'features' not in data:
         warn(
             f"Failed to fetch data for station '{stationID}' ({info_dict['name']}):\n" + str(data),
@@ -229,51 +398,60 @@ def fetch_station_data(
         )
         return None
 
-    for record in data['features']:
-        d['location'].append(info_dict.get('name', None))
-        d['geometry'].append(info_dict.get('geometry', {}))
+    features = data['features']
+
+    ### Build a dictionary of columns from the JSON response.
+    ### Every column holds one slot per record, so all columns share the same length.
+    ### E.g. { 'col1' : [ 1, 2, 3 ], 'col2' : [ 4, None, 6 ] }
+    ### The location and geometry are the same for every record of a station.
+    n = len(features)
+    d = {
+        'location': [info_dict.get('name', None)] * n,
+        'geometry': [info_dict.get('geometry', {})] * n,
+    }
+
+    ### Unit-suffixed column names are built once per (column, unit) rather than per record.
+    unit_cols = {}
 
+    for i, record in enumerate(features):
         for col, v in record.get('properties', {}).items():
             if col.startswith('@'):
                 continue
 
+            ### NOAA timestamps are always ISO-8601, so parse them directly
+            ### rather than leaving them for datetime inference.
             if col == 'timestamp':
-                val = v
+                val = datetime.datetime.fromisoformat(v) if v else v
             ### We could just use the stationID provided, but it's given in the JSON
             ### so we might as well use it.
             elif col == 'station':
-                val = v.split('/')[-1]
-            elif isinstance(v, dict) and 'value' in v:
-                val = v['value']
+                val = v.rsplit('/', 1)[-1]
+            ### Measurements are the common case; `type() is` skips the `isinstance` MRO walk.
+            elif type(v) is dict:
+                val = v.get('value', v)
+
+                ### If possible, append units to column name.
+                unit_code = v.get('unitCode', None)
+                if unit_code is not None:
+                    unit_key = (col, unit_code)
+                    unit_col = unit_cols.get(unit_key, None)
+                    if unit_col is None:
+                        unit_col = col + " (" + unit_code.replace('wmoUnit:', '') + ")"
+                        unit_cols[unit_key] = unit_col
+                    col = unit_col
             else:
                 val = v
 
-            ### If possible, append units to column name.
-            if isinstance(v, dict) and 'unitCode' in v:
-                col += " (" + v['unitCode'].replace('wmoUnit:', '') + ")"
-
             if col == 'cloudLayers' and val is None:
                 val = []
 
-            ### Grow the lists in the dictionary.
-            ### E.g. { 'col1' : [ 1, 2, 3 ], 'col2' : [ 4, 5, 6 ] }
             if col not in d:
-                d[col] = []
-            d[col].append(val)
-
-    ### Normalize the lengths.
-    klens, lens = {}, {}
-    for k, v in d.items():
-        klens[k] = len(v)
-    for k, l in klens.items():
-        if l not in lens:
-            lens[l] = 0
-        lens[l] += 1
-    max_l, max_c = 0, 0
-    for l, c in lens.items():
-        if c > max_c:
-            max_c = c
-            max_l = l
-    norm_keys = [k for k, l in klens.items() if l == max_l]
-    norm_d = {k: d[k] for k in norm_keys}
-    return norm_d
+                d[col] = [None] * n
+            d[col][i] = val
+
+    ### Records without a `cloudLayers` key still get an empty list rather than null.
+    cloud_layers = d.get('cloudLayers', None)
+    if cloud_layers is not None:
+        d['cloudLayers'] = [([] if layers is None else layers) for layers in cloud_layers]
+
+    return d